@@ -14,18 +14,35 @@ import streamlit as st
 import ollama
 import re
 import io
+import os
+import json
+import tempfile
 import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 
 # ── Compatibility patch ───────────────────────────────────────────────────────
 # Some macOS/OpenSSL versions don't support the `usedforsecurity` kwarg that
 # ReportLab passes internally to hashlib.md5(). This patch ensures it works
-# across all environments.
-_original_md5 = hashlib.md5
-def _patched_md5(*args, **kwargs):
-    kwargs.pop("usedforsecurity", None)
-    return _original_md5(*args, **kwargs)
-hashlib.md5 = _patched_md5
+# across all environments, and is only installed where the kwarg is missing.
+try:
+    hashlib.md5(b"", usedforsecurity=False)
+    _NEEDS_MD5_PATCH = False
+except TypeError:
+    _NEEDS_MD5_PATCH = True
+
+if _NEEDS_MD5_PATCH:
+    _original_md5 = hashlib.md5
+    def _patched_md5(data=b"", **kwargs):
+        if not kwargs:
+            return _original_md5(data)
+        kwargs.pop("usedforsecurity", None)
+        return _original_md5(data, **kwargs)
+    hashlib.md5 = _patched_md5
 # ─────────────────────────────────────────────────────────────────────────────
 
 from reportlab.lib.pagesizes import A4
@@ -45,6 +62,12 @@ st.set_page_config(
 )
 
 DEFAULT_MODEL = "llama3.1:8b"
+PRD_STORE_DIR = Path.home() / ".prd_generator" / "prds"
+RESPONSE_CACHE_SIZE = 512
+RESPONSE_CACHE_TTL  = 24 * 3600   # seconds before a cached response counts as a miss
+HISTORY_WINDOW      = 20     # chat messages rendered before "show earlier" kicks in
+STREAM_FLUSH_CHARS  = 64     # UI flush once this many characters are buffered…
+STREAM_FLUSH_SECS   = 0.05   # …or this long has passed since the last flush
 
 SYSTEM_PROMPT = """You are an expert AI Product Manager assistant that writes world-class Product Requirements Documents (PRDs).
 
@@ -81,79 +104,223 @@ Writing style: Sharp, strategic, PM-native. Like a Senior PM at Atlassian or Can
 CRITICAL: The ENTIRE PRD must be inside <PRD_START>...</PRD_END> tags. Only commentary goes outside."""
 
 
+# ─────────────────────────────────────────────────────────────
+# Static markup, emitted on every rerun
+# ─────────────────────────────────────────────────────────────
+_CSS_BLOCK = """
+<style>
+@import url('https://fonts.googleapis.com/css2?family=Playfair+Display:wght@400;700&family=Space+Mono&family=Inter:wght@300;400;500;600&display=swap');
+
+html, body, [class*="css"] { font-family: 'Inter', sans-serif; }
+#MainMenu, footer, header { visibility: hidden; }
+.block-container { padding-top: 1.5rem; }
+
+.app-header { display:flex; align-items:center; gap:14px; padding-bottom:1.2rem; border-bottom:1px solid #e2e8f0; margin-bottom:1.5rem; }
+.app-logo { width:40px; height:40px; border-radius:10px; background:linear-gradient(135deg,#1e40af,#7c3aed); display:flex; align-items:center; justify-content:center; font-size:1.1rem; color:white; }
+.app-title { font-family:'Playfair Display',serif; font-size:1.4rem; font-weight:700; color:#0f172a; margin:0; }
+.app-sub   { font-family:'Space Mono',monospace; font-size:.62rem; color:#94a3b8; text-transform:uppercase; letter-spacing:.08em; }
+
+.msg-user { background:linear-gradient(135deg,#1e40af,#2563eb); color:#fff; padding:.85rem 1.15rem; border-radius:18px 18px 4px 18px; margin:.4rem 0 .4rem 18%; line-height:1.65; font-size:.91rem; box-shadow:0 2px 12px rgba(30,64,175,.25); }
+.msg-bot  { background:#fff; color:#1e293b; padding:.85rem 1.15rem; border-radius:18px 18px 18px 4px; margin:.4rem 18% .4rem 0; border:1px solid #e2e8f0; line-height:1.65; font-size:.91rem; box-shadow:0 2px 10px rgba(0,0,0,.05); }
+.msg-lbl  { font-family:'Space Mono',monospace; font-size:.62rem; text-transform:uppercase; letter-spacing:.06em; color:#94a3b8; margin-bottom:3px; }
+.msg-lbl-r { text-align:right; }
+
+.prd-viewer { background:#fff; border-radius:12px; padding:2rem 2.5rem; border:1px solid #e2e8f0; line-height:1.75; box-shadow:0 4px 20px rgba(0,0,0,.06); }
+.prd-viewer h1 { font-family:'Playfair Display',serif; color:#0f172a; border-bottom:2px solid #e2e8f0; padding-bottom:.4rem; }
+.prd-viewer h2 { font-family:'Space Mono',monospace; font-size:.78rem; text-transform:uppercase; letter-spacing:.06em; color:#1e40af; margin-top:1.8rem; }
+.prd-viewer h3 { color:#374151; font-weight:700; }
+.prd-viewer ul, .prd-viewer ol { padding-left:1.4rem; }
+.prd-viewer li { margin-bottom:.3rem; color:#374151; }
+.prd-viewer p  { color:#374151; }
+.prd-viewer strong { color:#0f172a; }
+.prd-viewer code { background:#f1f5f9; padding:.1em .35em; border-radius:4px; font-family:'Space Mono',monospace; font-size:.83em; }
+.prd-viewer hr { border:none; border-top:1px solid #e2e8f0; }
+
+.dot-ok { display:inline-block; width:8px; height:8px; border-radius:50%; background:#22c55e; margin-right:5px; }
+.sb-lbl { font-family:'Space Mono',monospace; font-size:.62rem; text-transform:uppercase; letter-spacing:.07em; color:#64748b; margin-bottom:.4rem; }
+</style>
+"""
+
+_HEADER_HTML = """
+<div class="app-header">
+  <div class="app-logo">✦</div>
+  <div>
+    <div class="app-title">PRD Generator</div>
+    <div class="app-sub">AI Product Co-Pilot · Powered by Ollama</div>
+  </div>
+</div>
+"""
+
+_FOOTER_HTML = """
+<div style="
+    text-align: center;
+    padding: 1.2rem 0 0.5rem 0;
+    margin-top: 2rem;
+    border-top: 1px solid #e2e8f0;
+    font-family: 'Space Mono', monospace;
+    font-size: 0.65rem;
+    color: #94a3b8;
+    letter-spacing: 0.05em;
+">
+    © 2026 <strong style="color:#64748b">Vaishnavi R.B.</strong> &nbsp;·&nbsp; PRD Generator — AI Product Co-Pilot &nbsp;·&nbsp; All rights reserved.
+</div>
+"""
+
+
+# ─────────────────────────────────────────────────────────────
+# Regex patterns
+# ─────────────────────────────────────────────────────────────
+_RE_PRD      = re.compile(r"<PRD_START>([\s\S]*?)<PRD_END>")
+_RE_INLINE   = re.compile(r"\*\*(.+?)\*\*|\*(.+?)\*|`(.+?)`")
+_RE_OL       = re.compile(r"^(\d+)\.\s")
+_RE_SAFENAME = re.compile(r"[^a-zA-Z0-9_\- ]")
+
+
 # ─────────────────────────────────────────────────────────────
 # Utility functions (all defined before use)
 # ─────────────────────────────────────────────────────────────
 
-def get_available_models():
+@st.cache_data(ttl=60, show_spinner=False)
+def _list_models() -> list[str]:
+    """Installed Ollama models, cached so reruns skip the `ollama.list()` call.
+    Raises when Ollama is down; exceptions are not cached, so it's retried next rerun."""
+    result = ollama.list()
+    return [m.model for m in result.models]
+
+
+def get_available_models() -> list[str]:
     try:
-        result = ollama.list()
-        return [m.model for m in result.models]
+        return _list_models()
     except Exception:
         return []
 
 
 def extract_prd(text: str):
     """Returns (prd_content | None, commentary)."""
-    match = re.search(r"<PRD_START>([\s\S]*?)<PRD_END>", text)
+    match = _RE_PRD.search(text)
     if match:
         prd = match.group(1).strip()
-        commentary = re.sub(r"<PRD_START>[\s\S]*?<PRD_END>", "", text).strip()
+        start, end = match.span()
+        if _RE_PRD.search(text, end):
+            commentary = _RE_PRD.sub("", text).strip()   # several blocks: strip them all
+        else:
+            commentary = (text[:start] + text[end:]).strip()
         return prd, commentary
     return None, text
 
 
 def extract_title(prd_content: str) -> str:
-    match = re.search(r"^#\s+(.+)$", prd_content, re.MULTILINE)
-    return match.group(1).strip() if match else f"PRD – {datetime.now().strftime('%d %b %Y')}"
+    # The template puts the H1 first, so only the opening few lines are scanned
+    for line in prd_content.split("\n", 8)[:8]:
+        if line.startswith("# "):
+            return line[2:].strip()
+    return f"PRD – {datetime.now().strftime('%d %b %Y')}"
+
+
+def _md_inline_repl(m: re.Match) -> str:
+    bold, ital, code = m.groups()
+    if bold is not None:
+        return f"<strong>{md_inline(bold)}</strong>"
+    if ital is not None:
+        return f"<em>{md_inline(ital)}</em>"
+    return f"<code>{code}</code>"
 
 
 def md_inline(text: str) -> str:
-    """Convert markdown inline syntax to HTML."""
-    text = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", text)
-    text = re.sub(r"\*(.+?)\*",     r"<em>\1</em>", text)
-    text = re.sub(r"`(.+?)`",       r"<code>\1</code>", text)
-    return text
+    """Convert markdown inline syntax to HTML in a single pass."""
+    return _RE_INLINE.sub(_md_inline_repl, text)
+
+
+def _pdf_inline_repl(m: re.Match) -> str:
+    bold, ital, code = m.groups()
+    if bold is not None:
+        return f"<b>{pdf_inline(bold)}</b>"
+    if ital is not None:
+        return f"<i>{pdf_inline(ital)}</i>"
+    return f'<font face="Courier">{code}</font>'
+
+
+def pdf_inline(text: str) -> str:
+    """Convert markdown inline syntax to ReportLab paragraph markup in a single pass."""
+    return _RE_INLINE.sub(_pdf_inline_repl, text)
+
+
+# Block kinds produced by classify(); both renderers dispatch on these.
+H1, H2, H3, UL, OL, HR, BLANK, TEXT = "h1", "h2", "h3", "ul", "ol", "hr", "blank", "text"
+_BLOCK_PREFIXES = {"#": H1, "##": H2, "###": H3, "-": UL, "*": UL}
+
+
+def classify(line: str) -> tuple:
+    """Returns (kind, payload) for one markdown line. OL payload is (number, text)."""
+    stripped = line.lstrip()
+    if not stripped:
+        return BLANK, ""
+    head, sep, rest = stripped.partition(" ")
+    kind = _BLOCK_PREFIXES.get(head) if sep else None
+    if kind:
+        return kind, rest
+    if stripped.startswith("---"):
+        return HR, ""
+    if stripped[:1].isdigit() and (m := _RE_OL.match(stripped)):
+        return OL, (m.group(1), stripped[m.end():])
+    return TEXT, stripped
 
 
-def prd_to_html(content: str) -> str:
-    """Render PRD markdown as HTML for the in-app viewer."""
-    out, lines = [], content.split("\n")
+def tokenize_prd(content: str) -> list:
+    """Classify every line of a PRD once, for reuse by the viewer and the PDF."""
+    return [classify(line) for line in content.split("\n")]
+
+
+def prd_tokens(item: dict) -> list:
+    """Token list for a stored PRD, computed on first use and kept on the item."""
+    if "tokens" not in item:
+        item["tokens"] = tokenize_prd(item["content"])
+    return item["tokens"]
+
+
+def prd_to_html(tokens: list) -> str:
+    """Render tokenized PRD markdown as HTML for the in-app viewer."""
+    buf = io.StringIO()
     in_ul = in_ol = False
 
+    def emit(html):
+        buf.write(html); buf.write("\n")
+
     def close():
         nonlocal in_ul, in_ol
-        if in_ul: out.append("</ul>"); in_ul = False
-        if in_ol: out.append("</ol>"); in_ol = False
-
-    for line in lines:
-        if line.startswith("# "):
-            close(); out.append(f"<h1>{line[2:]}</h1>")
-        elif line.startswith("## "):
-            close(); out.append(f"<h2>{line[3:]}</h2>")
-        elif line.startswith("### "):
-            close(); out.append(f"<h3>{line[4:]}</h3>")
-        elif line.startswith(("- ", "* ")):
-            if in_ol: out.append("</ol>"); in_ol = False
-            if not in_ul: out.append("<ul>"); in_ul = True
-            out.append(f"<li>{md_inline(line[2:])}</li>")
-        elif re.match(r"^\d+\. ", line):
-            if in_ul: out.append("</ul>"); in_ul = False
-            if not in_ol: out.append("<ol>"); in_ol = True
-            out.append(f"<li>{md_inline(re.sub(r'^[0-9]+. ', '', line))}</li>")
-        elif line.startswith("---"):
-            close(); out.append("<hr>")
-        elif not line.strip():
-            close(); out.append("<div style='height:5px'></div>")
+        if in_ul: emit("</ul>"); in_ul = False
+        if in_ol: emit("</ol>"); in_ol = False
+
+    for kind, text in tokens:
+        if kind == H1:
+            close(); emit(f"<h1>{text}</h1>")
+        elif kind == H2:
+            close(); emit(f"<h2>{text}</h2>")
+        elif kind == H3:
+            close(); emit(f"<h3>{text}</h3>")
+        elif kind == UL:
+            if in_ol: emit("</ol>"); in_ol = False
+            if not in_ul: emit("<ul>"); in_ul = True
+            emit(f"<li>{md_inline(text)}</li>")
+        elif kind == OL:
+            if in_ul: emit("</ul>"); in_ul = False
+            if not in_ol: emit("<ol>"); in_ol = True
+            emit(f"<li>{md_inline(text[1])}</li>")
+        elif kind == HR:
+            close(); emit("<hr>")
+        elif kind == BLANK:
+            close(); emit("<div style='height:5px'></div>")
         else:
-            close(); out.append(f"<p>{md_inline(line)}</p>")
+            close(); emit(f"<p>{md_inline(text)}</p>")
 
     close()
-    return "\n".join(out)
+    return buf.getvalue()
 
 
-def generate_pdf(prd_content: str, title: str) -> bytes:
-    """Render PRD markdown to a styled PDF via ReportLab."""
+@st.cache_data(show_spinner=False, max_entries=64)
+def generate_pdf(tokens: list, title: str, date: str) -> bytes:
+    """Render tokenized PRD markdown to a styled PDF via ReportLab.
+    `date` is stamped in the header and is part of the cache key."""
     buf = io.BytesIO()
 
     NAVY = HexColor("#1e40af")
@@ -173,41 +340,60 @@ def generate_pdf(prd_content: str, title: str) -> bytes:
     sBull = ParagraphStyle("Bl", fontName="Helvetica",      fontSize=10, textColor=GREY, spaceAfter=2,  leading=15, leftIndent=14)
     sMeta = ParagraphStyle("Mt", fontName="Helvetica",      fontSize=8,  textColor=DIM,  spaceAfter=2,  leading=11)
 
-    def il(t):
-        t = re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", t)
-        t = re.sub(r"\*(.+?)\*",     r"<i>\1</i>", t)
-        t = re.sub(r"`(.+?)`",       r'<font face="Courier">\1</font>', t)
-        return t
+    il = pdf_inline
 
     story = [
         Paragraph("PRODUCT REQUIREMENTS DOCUMENT", sMeta),
         Spacer(1, 3),
         Paragraph(title, sH1),
         Spacer(1, 2),
-        Paragraph(f"PRD Generator · AI Co-Pilot &nbsp;|&nbsp; {datetime.now().strftime('%d %B %Y')}", sMeta),
+        Paragraph(f"PRD Generator · AI Co-Pilot &nbsp;|&nbsp; {date}", sMeta),
         HRFlowable(width="100%", thickness=2, color=NAVY, spaceAfter=14),
     ]
 
-    for line in prd_content.split("\n"):
-        if line.startswith("# "):
+    # Consecutive body lines (and list items) are merged into one Paragraph each,
+    # which keeps the flowable count — and ReportLab's layout work — low.
+    run, run_style = [], None
+
+    def flush():
+        nonlocal run_style
+        if run:
+            story.append(Paragraph("<br/>".join(run), run_style))
+            run.clear()
+        run_style = None
+
+    def queue(markup, style):
+        nonlocal run_style
+        if style is not run_style:
+            flush(); run_style = style
+        run.append(markup)
+
+    for kind, text in tokens:
+        if kind == UL:
+            queue(f"• &nbsp;{il(text)}", sBull)
+            continue
+        if kind == OL:
+            n, txt = text
+            queue(f"<b>{n}.</b> &nbsp;{il(txt)}", sBull)
+            continue
+        if kind == TEXT:
+            queue(il(text), sBody)
+            continue
+
+        flush()
+        if kind == H1:
             pass  # Title already in header
-        elif line.startswith("## "):
+        elif kind == H2:
             story += [HRFlowable(width="100%", thickness=0.5, color=RULE, spaceBefore=6, spaceAfter=3),
-                      Paragraph(line[3:].upper(), sH2)]
-        elif line.startswith("### "):
-            story.append(Paragraph(il(line[4:]), sH3))
-        elif line.startswith(("- ", "* ")):
-            story.append(Paragraph(f"• &nbsp;{il(line[2:])}", sBull))
-        elif re.match(r"^\d+\. ", line):
-            n   = re.match(r"^(\d+)\.", line).group(1)
-            txt = re.sub(r"^\d+\. ", "", line)
-            story.append(Paragraph(f"<b>{n}.</b> &nbsp;{il(txt)}", sBull))
-        elif line.startswith("---"):
+                      Paragraph(text.upper(), sH2)]
+        elif kind == H3:
+            story.append(Paragraph(il(text), sH3))
+        elif kind == HR:
             story.append(HRFlowable(width="100%", thickness=0.5, color=RULE, spaceBefore=2, spaceAfter=2))
-        elif not line.strip():
-            story.append(Spacer(1, 4))
         else:
-            story.append(Paragraph(il(line), sBody))
+            story.append(Spacer(1, 4))
+
+    flush()
 
     story += [
         Spacer(1, 14),
@@ -227,51 +413,178 @@ def stream_ollama(messages: list, model: str):
         yield chunk["message"]["content"]
 
 
-# ─────────────────────────────────────────────────────────────
-# CSS
-# ─────────────────────────────────────────────────────────────
-st.markdown("""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=Playfair+Display:wght@400;700&family=Space+Mono&family=Inter:wght@300;400;500;600&display=swap');
+@st.cache_resource
+def _response_cache():
+    """Process-wide LRU of (stored_at, response) entries, shared across sessions."""
+    return OrderedDict(), threading.Lock()
 
-html, body, [class*="css"] { font-family: 'Inter', sans-serif; }
-#MainMenu, footer, header { visibility: hidden; }
-.block-container { padding-top: 1.5rem; }
 
-.app-header { display:flex; align-items:center; gap:14px; padding-bottom:1.2rem; border-bottom:1px solid #e2e8f0; margin-bottom:1.5rem; }
-.app-logo { width:40px; height:40px; border-radius:10px; background:linear-gradient(135deg,#1e40af,#7c3aed); display:flex; align-items:center; justify-content:center; font-size:1.1rem; color:white; }
-.app-title { font-family:'Playfair Display',serif; font-size:1.4rem; font-weight:700; color:#0f172a; margin:0; }
-.app-sub   { font-family:'Space Mono',monospace; font-size:.62rem; color:#94a3b8; text-transform:uppercase; letter-spacing:.08em; }
+def _response_key(messages: list, model: str) -> tuple:
+    # The prompt hash keeps replies from an older SYSTEM_PROMPT from being served
+    prompt = hashlib.sha1(SYSTEM_PROMPT.encode("utf-8")).hexdigest()
+    return prompt, model, tuple((m["role"], m["content"]) for m in messages)
 
-.msg-user { background:linear-gradient(135deg,#1e40af,#2563eb); color:#fff; padding:.85rem 1.15rem; border-radius:18px 18px 4px 18px; margin:.4rem 0 .4rem 18%; line-height:1.65; font-size:.91rem; box-shadow:0 2px 12px rgba(30,64,175,.25); }
-.msg-bot  { background:#fff; color:#1e293b; padding:.85rem 1.15rem; border-radius:18px 18px 18px 4px; margin:.4rem 18% .4rem 0; border:1px solid #e2e8f0; line-height:1.65; font-size:.91rem; box-shadow:0 2px 10px rgba(0,0,0,.05); }
-.msg-lbl  { font-family:'Space Mono',monospace; font-size:.62rem; text-transform:uppercase; letter-spacing:.06em; color:#94a3b8; margin-bottom:3px; }
-.msg-lbl-r { text-align:right; }
 
-.prd-viewer { background:#fff; border-radius:12px; padding:2rem 2.5rem; border:1px solid #e2e8f0; line-height:1.75; box-shadow:0 4px 20px rgba(0,0,0,.06); }
-.prd-viewer h1 { font-family:'Playfair Display',serif; color:#0f172a; border-bottom:2px solid #e2e8f0; padding-bottom:.4rem; }
-.prd-viewer h2 { font-family:'Space Mono',monospace; font-size:.78rem; text-transform:uppercase; letter-spacing:.06em; color:#1e40af; margin-top:1.8rem; }
-.prd-viewer h3 { color:#374151; font-weight:700; }
-.prd-viewer ul, .prd-viewer ol { padding-left:1.4rem; }
-.prd-viewer li { margin-bottom:.3rem; color:#374151; }
-.prd-viewer p  { color:#374151; }
-.prd-viewer strong { color:#0f172a; }
-.prd-viewer code { background:#f1f5f9; padding:.1em .35em; border-radius:4px; font-family:'Space Mono',monospace; font-size:.83em; }
-.prd-viewer hr { border:none; border-top:1px solid #e2e8f0; }
+def get_cached_response(messages: list, model: str):
+    """Returns the stored response for an identical conversation, or None if
+    absent or older than RESPONSE_CACHE_TTL."""
+    cache, lock = _response_cache()
+    key = _response_key(messages, model)
+    with lock:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        stored_at, response = entry
+        if time.monotonic() - stored_at > RESPONSE_CACHE_TTL:
+            del cache[key]
+            return None
+        cache.move_to_end(key)
+        return response
+
+
+def store_response(messages: list, model: str, response: str):
+    cache, lock = _response_cache()
+    with lock:
+        cache[_response_key(messages, model)] = (time.monotonic(), response)
+        while len(cache) > RESPONSE_CACHE_SIZE:
+            cache.popitem(last=False)
 
-.dot-ok { display:inline-block; width:8px; height:8px; border-radius:50%; background:#22c55e; margin-right:5px; }
-.sb-lbl { font-family:'Space Mono',monospace; font-size:.62rem; text-transform:uppercase; letter-spacing:.07em; color:#64748b; margin-bottom:.4rem; }
-</style>
-""", unsafe_allow_html=True)
+
+def prd_id(content: str) -> str:
+    """Stable id for a PRD, derived from its content."""
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()[:12]
+
+
+def save_prd(item: dict):
+    """Write a PRD to disk so it survives server restarts and is shared across tabs."""
+    record = {k: item[k] for k in ("title", "content", "timestamp")}
+    tmp = None
+    try:
+        PRD_STORE_DIR.mkdir(parents=True, exist_ok=True)
+        # Write beside the target and swap it in, so readers never see a partial file
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=PRD_STORE_DIR,
+                                         suffix=".tmp", delete=False) as f:
+            tmp = f.name
+            json.dump(record, f)
+        os.replace(tmp, PRD_STORE_DIR / f"{item['id']}.json")
+    except OSError:
+        if tmp:
+            try: os.remove(tmp)
+            except OSError: pass
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def _read_prd_file(path: str, mtime: float):
+    """Parsed PRD record, or None if unreadable or malformed; keyed on mtime so
+    rewritten files are re-read."""
+    try:
+        record = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(record, dict):
+        return None
+    if not all(isinstance(record.get(k), str) for k in ("title", "content", "timestamp")):
+        return None
+    return record
+
+
+def load_saved_prds() -> list:
+    """All PRDs on disk, newest first."""
+    try:
+        files = sorted(((f.stat().st_mtime, f) for f in PRD_STORE_DIR.glob("*.json")),
+                       key=lambda t: t[0], reverse=True)
+    except OSError:
+        return []
+    records = (_read_prd_file(str(f), mtime) for mtime, f in files)
+    return [dict(r, id=prd_id(r["content"])) for r in records if r]
+
+
+@st.cache_resource
+def _pdf_pool():
+    """Shared worker pool for rendering PDFs off the script thread."""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="prd-pdf")
+
+
+def prd_pdf_future(item: dict):
+    """Pending or finished PDF render for a stored PRD; a new job is only
+    submitted when none exists yet or the header date has rolled over."""
+    today = datetime.now().strftime("%d %B %Y")
+    if "pdf_future" not in item or item.get("pdf_date") != today:
+        item["pdf_date"]   = today
+        item["pdf_future"] = _pdf_pool().submit(generate_pdf, prd_tokens(item), item["title"], today)
+    return item["pdf_future"]
+
+
+def find_prd(pid: str):
+    """The session PRD with the given id, or None."""
+    return next((p for p in st.session_state.prds if p["id"] == pid), None)
+
+
+def render_prd_card(title: str, pid: str, key: str):
+    """Inline "PRD generated" notice with a button that opens the viewer."""
+    ca, cb = st.columns([2, 1])
+    with ca:
+        st.info(f"✦ **{title}** — PRD generated")
+    with cb:
+        if st.button("View & Download →", key=key):
+            st.session_state.view_prd_id = pid
+            st.rerun()
+
+
+def render_prd_list():
+    """Sidebar list of generated PRDs, newest first."""
+    if st.session_state.prds:
+        for item in st.session_state.prds:
+            c1, c2 = st.columns([3, 1])
+            with c1:
+                short = item["title"][:26] + ("…" if len(item["title"]) > 26 else "")
+                st.markdown(f'<div style="font-size:.8rem;font-weight:500;color:#1e293b">{short}</div>'
+                            f'<div style="font-size:.65rem;color:#94a3b8;font-family:Space Mono,monospace">{item["timestamp"]}</div>',
+                            unsafe_allow_html=True)
+            with c2:
+                if st.button("Open", key=f"sb_v{item['id']}"):
+                    st.session_state.view_prd_id = item["id"]
+                    st.rerun()
+    else:
+        st.markdown('<div style="font-size:.8rem;color:#94a3b8;font-style:italic">None yet</div>', unsafe_allow_html=True)
+
+
+def render_message(i: int, msg: dict):
+    """Render one chat history entry; PRD extraction and id are cached on the message."""
+    if msg["role"] == "user":
+        with st.chat_message("user"):
+            st.markdown(msg["content"])
+        return
+
+    if "_prd" not in msg:
+        msg["_prd"], msg["_commentary"] = extract_prd(msg["content"])
+    if "_prd_id" not in msg:
+        msg["_prd_id"] = prd_id(msg["_prd"]) if msg["_prd"] else None
+    with st.chat_message("assistant"):
+        st.markdown(msg["_commentary"])
+        if msg["_prd_id"]:
+            item = find_prd(msg["_prd_id"])
+            if item is not None:
+                render_prd_card(item["title"], item["id"], key=f"open_{i}")
+
+
+# ─────────────────────────────────────────────────────────────
+# CSS
+# ─────────────────────────────────────────────────────────────
+st.markdown(_CSS_BLOCK, unsafe_allow_html=True)
 
 
 # ─────────────────────────────────────────────────────────────
-# Session state
+# Session state  (prds is kept newest-first)
 # ─────────────────────────────────────────────────────────────
-for key, val in [("messages", []), ("prds", []), ("view_prd_idx", None), ("model", DEFAULT_MODEL)]:
+for key, val in [("messages", []), ("prds", []), ("view_prd_id", None), ("model", DEFAULT_MODEL)]:
     if key not in st.session_state:
         st.session_state[key] = val
 
+if "prds_loaded" not in st.session_state:
+    st.session_state.prds.extend(load_saved_prds())
+    st.session_state.prds_loaded = True
+
 
 # ─────────────────────────────────────────────────────────────
 # Sidebar
@@ -288,29 +601,20 @@ with st.sidebar:
     else:
         st.error("Ollama not running.\n\n`ollama serve`")
 
+    if st.button("↻ Refresh models", use_container_width=True):
+        _list_models.clear()
+        st.rerun()
+
     st.divider()
     st.markdown('<div class="sb-lbl">Generated PRDs</div>', unsafe_allow_html=True)
 
-    if st.session_state.prds:
-        for ri, item in enumerate(reversed(st.session_state.prds)):
-            real_i = len(st.session_state.prds) - 1 - ri
-            c1, c2 = st.columns([3, 1])
-            with c1:
-                short = item["title"][:26] + ("…" if len(item["title"]) > 26 else "")
-                st.markdown(f'<div style="font-size:.8rem;font-weight:500;color:#1e293b">{short}</div>'
-                            f'<div style="font-size:.65rem;color:#94a3b8;font-family:Space Mono,monospace">{item["timestamp"]}</div>',
-                            unsafe_allow_html=True)
-            with c2:
-                if st.button("Open", key=f"sb_v{real_i}"):
-                    st.session_state.view_prd_idx = real_i
-                    st.rerun()
-    else:
-        st.markdown('<div style="font-size:.8rem;color:#94a3b8;font-style:italic">None yet</div>', unsafe_allow_html=True)
+    # Filled at the end of the script so a PRD generated in this pass shows up
+    prd_list = st.container()
 
     st.divider()
     if st.button("↺ New Conversation", use_container_width=True):
         st.session_state.messages     = []
-        st.session_state.view_prd_idx = None
+        st.session_state.view_prd_id = None
         st.rerun()
 
     with st.expander("💡 Tips"):
@@ -325,38 +629,33 @@ with st.sidebar:
 # ─────────────────────────────────────────────────────────────
 # App header
 # ─────────────────────────────────────────────────────────────
-st.markdown("""
-<div class="app-header">
-  <div class="app-logo">✦</div>
-  <div>
-    <div class="app-title">PRD Generator</div>
-    <div class="app-sub">AI Product Co-Pilot · Powered by Ollama</div>
-  </div>
-</div>
-""", unsafe_allow_html=True)
+st.markdown(_HEADER_HTML, unsafe_allow_html=True)
 
 
 # ─────────────────────────────────────────────────────────────
 # PRD Viewer
 # ─────────────────────────────────────────────────────────────
-if st.session_state.view_prd_idx is not None:
-    item = st.session_state.prds[st.session_state.view_prd_idx]
+item = find_prd(st.session_state.view_prd_id) if st.session_state.view_prd_id else None
+if item is not None:
+    # Start (or reuse) the PDF render in the background while the HTML viewer renders
+    pdf_future = prd_pdf_future(item)
 
     col_back, col_dl = st.columns(2)
     with col_back:
         if st.button("← Back to Chat"):
-            st.session_state.view_prd_idx = None
+            st.session_state.view_prd_id = None
             st.rerun()
+
+    st.markdown(f'<div class="prd-viewer">{prd_to_html(prd_tokens(item))}</div>', unsafe_allow_html=True)
+
     with col_dl:
-        pdf = generate_pdf(item["content"], item["title"])
-        safe_name = re.sub(r"[^a-zA-Z0-9_\- ]", "", item["title"])[:40].replace(" ", "_")
+        pdf = pdf_future.result()
+        safe_name = _RE_SAFENAME.sub("", item["title"])[:40].replace(" ", "_")
         st.download_button("↓ Download PDF", data=pdf,
                            file_name=f"PRD_{safe_name}.pdf",
                            mime="application/pdf",
                            use_container_width=True, type="primary")
 
-    st.markdown(f'<div class="prd-viewer">{prd_to_html(item["content"])}</div>', unsafe_allow_html=True)
-
 
 # ─────────────────────────────────────────────────────────────
 # Chat view
@@ -367,26 +666,16 @@ else:
         with st.chat_message("assistant"):
             st.markdown("**Welcome to PRD Generator** — your AI product co-pilot. ✦\n\nI'll craft a professional PRD with you through a short conversation.\n\nTell me: **what feature or product are you building?** One sentence is fine — I'll ask the right discovery questions.")
 
-    # Render full chat history
-    for i, msg in enumerate(st.session_state.messages):
-        if msg["role"] == "user":
-            with st.chat_message("user"):
-                st.markdown(msg["content"])
+    # Render recent chat history; older turns only on request
+    msgs  = st.session_state.messages
+    start = max(0, len(msgs) - HISTORY_WINDOW)
+    if start:
+        if st.toggle("Show earlier…", key="show_earlier"):
+            start = 0
         else:
-            prd_c, commentary = extract_prd(msg["content"])
-            with st.chat_message("assistant"):
-                st.markdown(commentary)
-                if prd_c:
-                    title   = extract_title(prd_c)
-                    prd_idx = next((j for j, p in enumerate(st.session_state.prds) if p["title"] == title), None)
-                    if prd_idx is not None:
-                        ca, cb = st.columns([2, 1])
-                        with ca:
-                            st.info(f"✦ **{title}** — PRD generated")
-                        with cb:
-                            if st.button("View & Download →", key=f"open_{i}"):
-                                st.session_state.view_prd_idx = prd_idx
-                                st.rerun()
+            st.caption(f"{start} earlier messages hidden")
+    for i in range(start, len(msgs)):
+        render_message(i, msgs[i])
 
     # Input — always rendered after history
     user_input = st.chat_input("Describe your feature, answer questions, or ask to refine a section…")
@@ -404,12 +693,28 @@ else:
         buf = {"full": ""}
         with st.chat_message("assistant"):
             try:
-                def _gen():
-                    for chunk in stream_ollama(api_msgs, st.session_state.model):
-                        buf["full"] += chunk
-                        yield chunk
-
-                st.write_stream(_gen())
+                cached = get_cached_response(api_msgs, st.session_state.model)
+                if cached is not None:
+                    buf["full"] = cached
+                    st.write_stream(iter([cached]))
+                else:
+                    def _gen():
+                        # Coalesce tokens so the chat bubble re-renders per batch, not per token
+                        pending, size, last = [], 0, time.monotonic()
+                        for chunk in stream_ollama(api_msgs, st.session_state.model):
+                            buf["full"] += chunk
+                            pending.append(chunk)
+                            size += len(chunk)
+                            now = time.monotonic()
+                            if size >= STREAM_FLUSH_CHARS or now - last >= STREAM_FLUSH_SECS:
+                                yield "".join(pending)
+                                pending.clear()
+                                size, last = 0, now
+                        if pending:
+                            yield "".join(pending)
+
+                    st.write_stream(_gen())
+                    store_response(api_msgs, st.session_state.model, buf["full"])
 
             except Exception as e:
                 buf["full"] = (f"⚠️ **Ollama connection error.**\n\n"
@@ -418,34 +723,38 @@ else:
                                f"Error: `{e}`")
                 st.error(buf["full"])
 
-        # 4. Persist and rerun to render PRD button if needed
-        full = buf["full"]
-        st.session_state.messages.append({"role": "assistant", "content": full})
+            # 4. Persist, and show the PRD button in this same pass (no rerun needed)
+            full = buf["full"]
+            prd_c, commentary = extract_prd(full)
+            pid = prd_id(prd_c) if prd_c else None
+            st.session_state.messages.append({"role": "assistant", "content": full,
+                                              "_prd": prd_c, "_commentary": commentary, "_prd_id": pid})
+
+            if prd_c:
+                item = {
+                    "id":        pid,
+                    "title":     extract_title(prd_c),
+                    "content":   prd_c,
+                    "tokens":    tokenize_prd(prd_c),
+                    "timestamp": datetime.now().strftime("%d %b, %H:%M"),
+                }
+                # A replayed conversation can reproduce a PRD that's already listed
+                st.session_state.prds[:] = [p for p in st.session_state.prds if p["id"] != item["id"]]
+                st.session_state.prds.insert(0, item)
+                save_prd(item)
+                # Pre-render the PDF off the script thread so the first download is instant
+                prd_pdf_future(item)
+                render_prd_card(item["title"], item["id"],
+                                key=f"open_{len(st.session_state.messages) - 1}")
 
-        prd_c, _ = extract_prd(full)
-        if prd_c:
-            st.session_state.prds.append({
-                "title":     extract_title(prd_c),
-                "content":   prd_c,
-                "timestamp": datetime.now().strftime("%d %b, %H:%M"),
-            })
 
-        st.rerun()
+# ─────────────────────────────────────────────────────────────
+# Sidebar PRD list (after the chat, so new PRDs are included)
+# ─────────────────────────────────────────────────────────────
+with prd_list:
+    render_prd_list()
 
 # ─────────────────────────────────────────────────────────────
 # Footer
 # ─────────────────────────────────────────────────────────────
-st.markdown("""
-<div style="
-    text-align: center;
-    padding: 1.2rem 0 0.5rem 0;
-    margin-top: 2rem;
-    border-top: 1px solid #e2e8f0;
-    font-family: 'Space Mono', monospace;
-    font-size: 0.65rem;
-    color: #94a3b8;
-    letter-spacing: 0.05em;
-">
-    © 2026 <strong style="color:#64748b">Vaishnavi R.B.</strong> &nbsp;·&nbsp; PRD Generator — AI Product Co-Pilot &nbsp;·&nbsp; All rights reserved.
-</div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+st.markdown(_FOOTER_HTML, unsafe_allow_html=True)
\ No newline at end of file